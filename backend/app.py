@@ -1,34 +1,53 @@
-from flask import Flask, request, jsonify, send_file
-from flask_cors import CORS
+from flask import Blueprint, current_app, request, jsonify, send_file
 from flask_socketio import SocketIO, emit, join_room, leave_room
-from models import db, Event, Problem, User, House, ChatMessage
-from db_utils import init_db
+from models import db, Event, EventChange, Problem, User, House, ChatMessage
+from db_utils import create_db_app, init_db
+from event_cache import event_cache
+from chat_writer import chat_writer
+from image_utils import normalize_images
+from sqlalchemy import update
 import base64
 import os
 import secrets
+import signal
 from datetime import datetime
 from io import BytesIO
 import json
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = secrets.token_hex(16)
+# Extensions are created unbound and attached to an app in create_app()
+socketio = SocketIO(cors_allowed_origins="*", async_mode='threading')
+api = Blueprint('api', __name__)
 
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///lemma_check_house.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+FRONTEND_PORT = os.getenv('FRONTEND_PORT', '5174')
 
-# Initialize extensions
-db.init_app(app)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
 
-# CORS configuration
-CORS(app, supports_credentials=True, origins="*",
-     allow_headers=["Content-Type", "Authorization", "Cache-Control"],
-     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
+def create_app(config=None):
+    """Create and configure the Flask application.
 
-FRONTEND_PORT = os.getenv('FRONTEND_PORT', '5174')
+    `config` may be a dict of overrides or a config class/object; it is
+    applied on top of the defaults in config.Config. Report generation
+    (python-docx/lxml) is imported on first use by the report route.
+    """
+    # CORS is only needed by the web server, so keep it out of module import
+    from flask_cors import CORS
+
+    app = create_db_app(config)
+
+    # Initialize extensions
+    app.register_blueprint(api)
+    socketio.init_app(app)
+    event_cache.init_app(app)
+    chat_writer.init_app(app, on_persisted=publish_persisted_chat_messages)
+
+    # CORS configuration
+    CORS(app, supports_credentials=True, origins="*",
+         allow_headers=["Content-Type", "Authorization", "Cache-Control"],
+         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
 
-@app.after_request
+    return app
+
+
+@api.after_app_request
 def add_private_network_header(response):
     response.headers["Access-Control-Allow-Private-Network"] = "true"
     return response
@@ -43,6 +62,85 @@ def publish_chat_message(event_url, message_data):
     except Exception as e:
         print(f"Error publishing chat message: {e}")
 
+
+def publish_persisted_chat_messages(event_url, mapping):
+    """Tell clients the real IDs of write-behind messages once committed"""
+    try:
+        socketio.emit('chat_messages_persisted', {
+            'event_url': event_url,
+            'messages': mapping
+        }, room=f'chat_{event_url}')
+    except Exception as e:
+        print(f"Error publishing persisted chat messages: {e}")
+
+
+def record_change(event, kind, problem=None, data=None):
+    """Append an entry to the event's change log in the current session.
+
+    Returns a (change, problem) pair for publish_event_changes(); `problem`
+    is only kept for added/updated changes so its current state is sent.
+    """
+    if problem is not None and problem.id is None:
+        db.session.flush()
+    # Incrementing in the UPDATE locks the event row until commit, so
+    # concurrent writers to one event get consecutive seqs in commit order
+    seq = db.session.execute(
+        update(Event)
+        .where(Event.id == event.id)
+        .values(last_change_seq=Event.last_change_seq + 1)
+        .returning(Event.last_change_seq),
+        execution_options={'synchronize_session': False}
+    ).scalar_one()
+    change = EventChange(
+        event_id=event.id,
+        seq=seq,
+        kind=kind,
+        problem_id=problem.id if problem is not None else None,
+        data=data
+    )
+    db.session.add(change)
+    if kind == EventChange.PROBLEM_REMOVED:
+        problem = None
+    return change, problem
+
+
+def hash_problem_images(problem, known_hashes=None):
+    """Store content and perceptual hashes for each of the problem's images.
+
+    `known_hashes` maps image strings to hashes already computed for them,
+    so resubmitted images are not decoded again.
+    """
+    # Imported lazily so NumPy/Pillow only load once images are written
+    from image_hash import compute_image_hashes
+    problem.image_hashes = compute_image_hashes(problem.image, known_hashes)
+
+
+def known_image_hashes(problems):
+    """Map each stored image string of `problems` to its stored hashes"""
+    known = {}
+    for problem in problems:
+        images = normalize_images(problem.image)
+        hashes = problem.image_hashes or []
+        if len(images) != len(hashes):
+            continue
+        for img_data, image_hashes in zip(images, hashes):
+            if isinstance(img_data, str) and image_hashes:
+                known[img_data] = image_hashes
+    return known
+
+
+def publish_event_changes(event, changes):
+    """Publish committed event changes to the event's chat room via Socket.IO"""
+    try:
+        socketio.emit('event_changes', {
+            'event_url': event.url,
+            'version': event.version,
+            'changes': [change.to_dict(problem) for change, problem in changes]
+        }, room=f'chat_{event.url}')
+        print(f"Published {len(changes)} event change(s) to room chat_{event.url}")
+    except Exception as e:
+        print(f"Error publishing event changes: {e}")
+
 # Socket.IO Events
 @socketio.on('connect')
 def handle_connect():
@@ -81,7 +179,7 @@ def handle_leave_chat(data):
         emit('error', {'message': str(e)})
 
 # Event Routes
-@app.route('/api/events', methods=['GET'])
+@api.route('/api/events', methods=['GET'])
 def create_event():
     """Create a new event and return the URL to access it"""
     try:
@@ -108,7 +206,7 @@ def create_event():
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/events/<int:event_id>/problems', methods=['POST'])
+@api.route('/api/events/<int:event_id>/problems', methods=['POST'])
 def add_problem(event_id):
     """Add a problem to an event's data list"""
     try:
@@ -123,8 +221,11 @@ def add_problem(event_id):
             important=data.get('important', False),
             category=data.get('category', 'general')
         )
+        hash_problem_images(problem)
         
         db.session.add(problem)
+        event.touch()
+        change = record_change(event, EventChange.PROBLEM_ADDED, problem)
 
         # Save system message to database
         system_message = ChatMessage(
@@ -135,6 +236,8 @@ def add_problem(event_id):
         )
         db.session.add(system_message)
         db.session.commit()
+        event_cache.invalidate(event.url)
+        publish_event_changes(event, [change])
 
         # Send system message to chat room
         publish_chat_message(event.url, {
@@ -154,29 +257,52 @@ def add_problem(event_id):
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/events/url/<url>', methods=['GET'])
+@api.route('/api/events/url/<url>', methods=['GET'])
 def get_event_by_url(url):
-    """Get event details by URL, including problems list and house info"""
-    try:
-        event = Event.query.filter_by(url=url).first_or_404()
-        event_dict = event.to_dict()
+    """Get event details by URL, including problems list and house info.
 
-        # Ensure problems are included as a list
-        event_dict['problems'] = [problem.to_dict() for problem in event.problems]
-
-        # Add house info if available
-        if event.house_id:
-            house = House.query.get(event.house_id)
-            event_dict['house'] = house.to_dict() if house else None
+    Responses carry a strong ETag derived from the event version, so an
+    unchanged event is answered with 304 before any problems are loaded.
+    Serialized payloads are kept in event_cache until the next write.
+    """
+    try:
+        stamp = db.session.query(Event.id, Event.version).filter_by(url=url).first_or_404()
+        etag = f'{stamp.id}-{stamp.version}'
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
         else:
-            event_dict['house'] = None
-
-        return jsonify({'success': True, 'event': event_dict})
+            payload = event_cache.get(url, stamp.version)
+            if payload is None:
+                event = Event.query.filter_by(url=url).first_or_404()
+                event_dict = event.to_dict()
+
+                # Ensure problems are included as a list
+                event_dict['problems'] = [problem.to_dict() for problem in event.problems]
+
+                # Add house info if available
+                if event.house_id:
+                    house = House.query.get(event.house_id)
+                    event_dict['house'] = house.to_dict() if house else None
+                else:
+                    event_dict['house'] = None
+
+                # Clients continue from here with the change feed
+                event_dict['change_seq'] = event.last_change_seq
+
+                # Stamp with the version actually serialized in case of a concurrent write
+                etag = event.etag
+                payload = current_app.json.dumps({'success': True, 'event': event_dict}).encode('utf-8')
+                event_cache.put(url, event.version, payload)
+            response = current_app.response_class(payload, mimetype='application/json')
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
         print(f"Error fetching event by URL: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/events/url/<url>', methods=['PUT'])
+@api.route('/api/events/url/<url>', methods=['PUT'])
 def update_event_by_url(url):
     """Update event details by URL, including house_id"""
     try:
@@ -186,21 +312,28 @@ def update_event_by_url(url):
         if 'house_id' in data:
             # Validate house_id exists
             house = House.query.get(data['house_id'])
-            if house:
-                event.house_id = data['house_id']
-            else:
+            if not house:
                 return jsonify({'success': False, 'error': 'Invalid house_id'}), 400
 
-        if 'old_house_id' in data:
-            event.old_house_id = data['old_house_id']
-        if 'flat' in data:
-            event.flat = data['flat']
-        if 'customer_name' in data:
-            event.customer_name = data['customer_name']
+        # Apply event fields, remembering which ones actually changed
+        changed_fields = {}
+        for field in ('house_id', 'old_house_id', 'flat', 'customer_name'):
+            if field in data and getattr(event, field) != data[field]:
+                setattr(event, field, data[field])
+                changed_fields[field] = data[field]
+
+        changes = []
+        if 'house_id' in changed_fields:
+            # Send the house itself so clients can patch it without a refetch
+            changed_fields['house'] = house.to_dict()
+        if changed_fields:
+            changes.append(record_change(event, EventChange.EVENT_UPDATED, data=changed_fields))
 
         # Update problems if provided
         if 'problems' in data:
+            known_hashes = known_image_hashes(event.problems)
             for problem in event.problems:
+                changes.append(record_change(event, EventChange.PROBLEM_REMOVED, problem))
                 db.session.delete(problem)
             for p in data['problems']:
                 problem = Problem(
@@ -210,9 +343,16 @@ def update_event_by_url(url):
                     important=p.get('important', False),
                     category=p.get('category', 'general')
                 )
+                hash_problem_images(problem, known_hashes)
                 db.session.add(problem)
+                changes.append(record_change(event, EventChange.PROBLEM_ADDED, problem))
 
+        if changes:
+            event.touch()
         db.session.commit()
+        event_cache.invalidate(url)
+        if changes:
+            publish_event_changes(event, changes)
 
         # Return updated event with house info
         event_dict = event.to_dict()
@@ -227,7 +367,7 @@ def update_event_by_url(url):
         print(f"Error updating event by URL: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/events/url/<url>/problems', methods=['POST'])
+@api.route('/api/events/url/<url>/problems', methods=['POST'])
 def add_problem_by_url(url):
     """Add a problem to an event's problems table using URL"""
     try:
@@ -242,7 +382,10 @@ def add_problem_by_url(url):
             important=data.get('important', False),
             category=data.get('category', '其它問題')
         )
+        hash_problem_images(problem)
         db.session.add(problem)
+        event.touch()
+        change = record_change(event, EventChange.PROBLEM_ADDED, problem)
 
         # Save system message to database
         system_message = ChatMessage(
@@ -253,6 +396,8 @@ def add_problem_by_url(url):
         )
         db.session.add(system_message)
         db.session.commit()
+        event_cache.invalidate(url)
+        publish_event_changes(event, [change])
 
         # Send system message to chat room
         publish_chat_message(url, {
@@ -271,13 +416,160 @@ def add_problem_by_url(url):
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/events/<url>/report', methods=['GET'])
+@api.route('/api/events/url/<url>/problems/<int:problem_id>', methods=['PUT'])
+def update_problem_by_url(url, problem_id):
+    """Update a single problem of an event"""
+    try:
+        event = Event.query.filter_by(url=url).first_or_404()
+        problem = Problem.query.filter_by(id=problem_id, event_id=event.id).first_or_404()
+        data = request.json
+        known_hashes = known_image_hashes([problem])
+
+        for field in ('image', 'description', 'important', 'category'):
+            if field in data:
+                setattr(problem, field, data[field])
+        if 'image' in data:
+            hash_problem_images(problem, known_hashes)
+
+        event.touch()
+        change = record_change(event, EventChange.PROBLEM_UPDATED, problem)
+        db.session.commit()
+        event_cache.invalidate(url)
+        publish_event_changes(event, [change])
+
+        return jsonify({'success': True, 'problem': problem.to_dict()})
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error updating problem: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/events/url/<url>/problems/<int:problem_id>', methods=['DELETE'])
+def delete_problem_by_url(url, problem_id):
+    """Remove a single problem from an event"""
+    try:
+        event = Event.query.filter_by(url=url).first_or_404()
+        problem = Problem.query.filter_by(id=problem_id, event_id=event.id).first_or_404()
+
+        change = record_change(event, EventChange.PROBLEM_REMOVED, problem)
+        db.session.delete(problem)
+        event.touch()
+        db.session.commit()
+        event_cache.invalidate(url)
+        publish_event_changes(event, [change])
+
+        return jsonify({'success': True, 'problem_id': problem_id})
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error deleting problem: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/events/url/<url>/changes', methods=['GET'])
+def get_event_changes(url):
+    """Get the event's change log entries after sequence number `since`.
+
+    Only the last added/updated entry of each problem carries its current
+    state, so catching up never repeats a problem's images. A problem that
+    was removed later has `problem: null` and a matching removal entry.
+    """
+    try:
+        event = Event.query.filter_by(url=url).first_or_404()
+        since = request.args.get('since', 0, type=int)
+
+        changes = EventChange.query.filter(
+            EventChange.event_id == event.id,
+            EventChange.seq > since
+        ).order_by(EventChange.seq.asc()).all()
+
+        # The last added/updated entry per problem is the one that gets its state
+        latest_entries = {}
+        for change in changes:
+            if change.problem_id and change.kind != EventChange.PROBLEM_REMOVED:
+                latest_entries[change.problem_id] = change.seq
+
+        # Load the current state of referenced problems in a single query
+        problems = {}
+        if latest_entries:
+            problems = {p.id: p for p in Problem.query.filter(Problem.id.in_(latest_entries)).all()}
+
+        return jsonify({
+            'success': True,
+            'version': event.version,
+            'latest_seq': changes[-1].seq if changes else since,
+            'changes': [
+                change.to_dict(problems.get(change.problem_id)
+                               if latest_entries.get(change.problem_id) == change.seq else None)
+                for change in changes
+            ]
+        })
+    except Exception as e:
+        print(f"Error fetching event changes: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/events/url/<url>/duplicates', methods=['GET'])
+def get_duplicate_images(url):
+    """Flag near-duplicate photos across the problems of an event or its house.
+
+    Query parameters: `scope` (event or house), `hash` (dhash or phash) and
+    `max_distance` (Hamming distance in bits). Only stored hashes are read,
+    never the images themselves.
+    """
+    try:
+        from image_hash import DEFAULT_MAX_DISTANCE, HASH_KINDS, find_near_duplicates
+
+        event = Event.query.filter_by(url=url).first_or_404()
+        scope = request.args.get('scope', 'event')
+        hash_kind = request.args.get('hash', 'dhash')
+        max_distance = request.args.get('max_distance', DEFAULT_MAX_DISTANCE, type=int)
+        if scope not in ('event', 'house') or hash_kind not in HASH_KINDS:
+            return jsonify({'success': False, 'error': 'Invalid scope or hash'}), 400
+        if scope == 'house' and not event.house_id:
+            return jsonify({'success': False, 'error': 'Event has no house_id for house scope'}), 400
+
+        query = db.session.query(Problem.id, Problem.event_id, Problem.image_hashes)
+        if scope == 'house':
+            query = query.join(Event).filter(Event.house_id == event.house_id)
+        else:
+            query = query.filter(Problem.event_id == event.id)
+
+        images = []
+        unhashed_problems = 0
+        for problem_id, event_id, image_hashes in query.all():
+            # Problems saved before hashing existed need `python image_hash.py` to backfill
+            if image_hashes is None:
+                unhashed_problems += 1
+                continue
+            for image_index, hashes in enumerate(image_hashes):
+                if hashes:
+                    images.append({'problem_id': problem_id, 'event_id': event_id,
+                                   'image_index': image_index, 'hashes': hashes})
+
+        pairs = find_near_duplicates([image['hashes'][hash_kind] for image in images], max_distance)
+        duplicates = [{
+            'a': {k: v for k, v in images[i].items() if k != 'hashes'},
+            'b': {k: v for k, v in images[j].items() if k != 'hashes'},
+            'distance': distance,
+            'exact': images[i]['hashes']['sha256'] == images[j]['hashes']['sha256']
+        } for i, j, distance in pairs]
+
+        return jsonify({
+            'success': True,
+            'scope': scope,
+            'hash': hash_kind,
+            'max_distance': max_distance,
+            'duplicates': duplicates,
+            'unhashed_problems': unhashed_problems
+        })
+    except Exception as e:
+        print(f"Error finding duplicate images: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api.route('/api/events/<url>/report', methods=['GET'])
 def generate_report(url):
     """Generate and download Word document report for the event"""
     try:
         event = Event.query.filter_by(url=url).first_or_404()
         
-        # Import here to avoid circular imports
+        # Imported lazily so python-docx/lxml only load when a report is requested
         from report_generator import generate_event_report
         
         # Generate the report
@@ -301,7 +593,7 @@ def generate_report(url):
         print(f"Error generating report: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/houses', methods=['GET'])
+@api.route('/api/houses', methods=['GET'])
 def get_all_houses():
     """Get all houses"""
     try:
@@ -311,21 +603,27 @@ def get_all_houses():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # Chat Routes
-@app.route('/api/events/url/<url>/chat/messages', methods=['GET'])
+@api.route('/api/events/url/<url>/chat/messages', methods=['GET'])
 def get_chat_messages(url):
     """Get all chat messages for an event"""
     try:
         event = Event.query.filter_by(url=url).first_or_404()
+        # Write-behind messages are broadcast before they are committed, so list
+        # them too. Snapshot them first; unpersisted() drops any the DB read returned.
+        pending = chat_writer.pending_for(event.id) if chat_writer.enabled else []
         messages = ChatMessage.query.filter_by(event_id=event.id).order_by(ChatMessage.timestamp.asc()).all()
+        message_list = [msg.to_dict() for msg in messages]
+        if pending:
+            message_list += chat_writer.unpersisted(pending, {msg['id'] for msg in message_list})
         return jsonify({
             'success': True,
-            'messages': [msg.to_dict() for msg in messages]
+            'messages': message_list
         })
     except Exception as e:
         print(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/events/url/<url>/chat/messages', methods=['POST'])
+@api.route('/api/events/url/<url>/chat/messages', methods=['POST'])
 def send_chat_message(url):
     """Send a chat message for an event"""
     try:
@@ -336,6 +634,15 @@ def send_chat_message(url):
         user_name = data.get('user', 'Anonymous')
         message_content = data.get('content') or data.get('message', '')
 
+        if chat_writer.enabled:
+            # Broadcast now with a provisional ID; the INSERT is batched in the background
+            message_data = chat_writer.submit(event, user_name, message_content)
+            publish_chat_message(url, dict(message_data))
+            return jsonify({
+                'success': True,
+                'message': message_data
+            }), 202
+
         message = ChatMessage(
             event_id=event.id,
             user=user_name,
@@ -361,16 +668,31 @@ def send_chat_message(url):
 
 
 # Health Check
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({'success': True, 'status': 'healthy', 'timestamp': datetime.now().isoformat()})
 
 # Initialize database when app starts
-def create_tables():
+def create_tables(app):
     with app.app_context():
         init_db()
 
+def _exit_on_sigterm(signum, frame):
+    """Turn SIGTERM into SystemExit so the shutdown below still runs"""
+    raise SystemExit(0)
+
 if __name__ == '__main__':
-    create_tables()
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000, allow_unsafe_werkzeug=True)
+    app = create_app()
+    create_tables(app)
+    # Process managers and containers stop the server with SIGTERM, which
+    # would otherwise skip both the finally block and atexit handlers
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+    try:
+        # The debug reloader SIGKILLs its server process when it is stopped,
+        # which would drop queued write-behind messages, so skip it then
+        socketio.run(app, debug=True, host='0.0.0.0', port=5000, allow_unsafe_werkzeug=True,
+                     use_reloader=not chat_writer.enabled)
+    finally:
+        # Commit any write-behind chat messages still queued
+        chat_writer.shutdown()
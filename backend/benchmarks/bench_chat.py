@@ -0,0 +1,105 @@
+"""Chat write benchmark: synchronous commits vs. write-behind group commit.
+
+Run from the backend directory:
+    python benchmarks/bench_chat.py [--rooms N] [--messages N] [--threads N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_mode(write_behind, rooms, messages, threads):
+    """Post `messages` chat messages per thread and report throughput/latency"""
+    sys.path.insert(0, BACKEND_DIR)
+    from app import create_app
+    from chat_writer import chat_writer
+    from models import db, ChatMessage
+
+    db_dir = tempfile.mkdtemp()
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(db_dir, 'bench.db')}",
+        'CHAT_WRITE_BEHIND': write_behind,
+    })
+    with app.app_context():
+        db.create_all()
+
+    client = app.test_client()
+    urls = [client.get('/api/events').json['url'] for _ in range(rooms)]
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(index):
+        local_client = app.test_client()
+        url = urls[index % rooms]
+        local = []
+        for n in range(messages):
+            start = time.perf_counter()
+            local_client.post(f'/api/events/url/{url}/chat/messages',
+                              json={'user': f'user{index}', 'message': f'message {n}'})
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    accepted = time.perf_counter() - start
+    chat_writer.shutdown()
+    durable = time.perf_counter() - start
+
+    with app.app_context():
+        stored = db.session.query(ChatMessage).count()
+
+    latencies.sort()
+    total = threads * messages
+    return {
+        'messages': total,
+        'stored': stored,
+        'accepted_per_sec': total / accepted,
+        'durable_per_sec': total / durable,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rooms', type=int, default=8)
+    parser.add_argument('--messages', type=int, default=200, help='messages per thread')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--mode', choices=['sync', 'write-behind'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        result = run_mode(args.mode == 'write-behind', args.rooms, args.messages, args.threads)
+        print(json.dumps(result))
+        return
+
+    print(f"{args.threads} threads x {args.messages} messages across {args.rooms} rooms")
+    # Each mode runs in a fresh interpreter so the write-behind thread state is isolated
+    for mode in ('sync', 'write-behind'):
+        output = subprocess.run(
+            [sys.executable, __file__, '--mode', mode, '--rooms', str(args.rooms),
+             '--messages', str(args.messages), '--threads', str(args.threads)],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+        r = json.loads(output.strip().splitlines()[-1])
+        print(f"  {mode:<13} {r['accepted_per_sec']:9.0f} msg/s accepted  "
+              f"{r['durable_per_sec']:9.0f} msg/s durable  "
+              f"p50 {r['p50_ms']:6.2f} ms  p99 {r['p99_ms']:6.2f} ms  "
+              f"stored {r['stored']}/{r['messages']}")
+
+
+if __name__ == '__main__':
+    main()
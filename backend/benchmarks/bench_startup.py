@@ -0,0 +1,91 @@
+"""Startup-time benchmark: cold import cost and first-request latency.
+
+Run from the backend directory:
+    python benchmarks/bench_startup.py [--runs N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each scenario runs in a fresh interpreter so module caches are cold
+SCENARIOS = {
+    'import_models': 'import models',
+    'create_db_app': 'from db_utils import create_db_app; create_db_app()',
+    'import_app': 'import app',
+    'create_app': 'from app import create_app; create_app()',
+}
+
+TIMER = '''
+import json, sys, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'docx_loaded': 'docx' in sys.modules,
+    'socketio_loaded': 'flask_socketio' in sys.modules,
+}}))
+'''
+
+FIRST_REQUEST = '''
+import json, time
+from app import create_app
+from models import db
+app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+with app.app_context():
+    db.create_all()
+client = app.test_client()
+start = time.perf_counter()
+client.get('/api/health')
+first = time.perf_counter() - start
+start = time.perf_counter()
+client.get('/api/health')
+second = time.perf_counter() - start
+print(json.dumps({'first': first, 'second': second}))
+'''
+
+
+def run_python(code):
+    output = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(samples):
+    return f"median {statistics.median(samples) * 1000:8.2f} ms  min {min(samples) * 1000:8.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"Cold start ({args.runs} runs each)")
+    for name, code in SCENARIOS.items():
+        results = [run_python(TIMER.format(code=code)) for _ in range(args.runs)]
+        seconds = [r['seconds'] for r in results]
+        flags = []
+        if results[-1]['docx_loaded']:
+            flags.append('docx')
+        if results[-1]['socketio_loaded']:
+            flags.append('socketio')
+        print(f"  {name:<16} {summarize(seconds)}  loaded: {', '.join(flags) or '-'}")
+
+    results = [run_python(FIRST_REQUEST) for _ in range(args.runs)]
+    print("Request latency (/api/health)")
+    print(f"  {'first':<16} {summarize([r['first'] for r in results])}")
+    print(f"  {'warm':<16} {summarize([r['second'] for r in results])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+from collections import OrderedDict, deque
+from datetime import datetime
+import atexit
+import itertools
+import secrets
+import threading
+import time
+
+from sqlalchemy import insert
+
+from models import db, ChatMessage
+
+
+# How many provisional -> real ID mappings to remember for unpersisted()
+PERSISTED_ID_HISTORY = 10000
+
+
+class ChatWriteBehind:
+    """Optional write-behind queue for chat messages.
+
+    Messages are handed out with a provisional ID so they can be broadcast
+    immediately; a background thread inserts them in batched transactions
+    every CHAT_FLUSH_INTERVAL_MS milliseconds or once CHAT_FLUSH_BATCH_SIZE
+    messages are waiting. On shutdown the queue is drained before exit.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.flush_interval = 0.005
+        self.batch_size = 100
+        self.on_persisted = None
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self._token = secrets.token_hex(4)
+        self._counter = itertools.count(1)
+        # Provisional ID -> real ID of recently inserted messages, for unpersisted()
+        self._persisted = OrderedDict()
+
+    def init_app(self, app, on_persisted=None):
+        """Bind to an app; `on_persisted(event_url, rows)` is called after each flush"""
+        self.app = app
+        self.enabled = app.config.get('CHAT_WRITE_BEHIND', False)
+        self.flush_interval = app.config.get('CHAT_FLUSH_INTERVAL_MS', 5) / 1000
+        self.batch_size = app.config.get('CHAT_FLUSH_BATCH_SIZE', 100)
+        self.on_persisted = on_persisted
+
+    def submit(self, event, user, message):
+        """Queue a chat message and return its provisional serialized form"""
+        timestamp = datetime.now()
+        message_data = {
+            'id': f'pending-{self._token}-{next(self._counter)}',
+            'event_id': event.id,
+            'user': user,
+            'message': message,
+            'timestamp': timestamp.isoformat(),
+            'pending': True
+        }
+        with self._condition:
+            if self._stopping:
+                raise RuntimeError('Chat writer is shutting down')
+            self._pending.append((event.url, timestamp, message_data))
+            self._ensure_started()
+            # Wake the idle flusher to start the interval, or flush a full batch now
+            if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                self._condition.notify()
+        return message_data
+
+    def pending_for(self, event_id):
+        """Messages for `event_id` that are queued but not yet committed"""
+        with self._condition:
+            return [dict(data) for _, _, data in self._pending if data['event_id'] == event_id]
+
+    def unpersisted(self, pending, committed_ids):
+        """Drop messages from a pending_for() snapshot that a later DB read already returned.
+
+        Take the snapshot before reading committed messages. A message
+        committed in between then appears in `committed_ids` under the real
+        ID recorded for it, and is listed only once. A message committed
+        after the read stays in the result, so it is never lost either.
+        """
+        with self._condition:
+            return [data for data in pending
+                    if self._persisted.get(data['id']) not in committed_ids]
+
+    def flush(self):
+        """Write every queued message now; safe to call from any thread"""
+        with self._flush_lock:
+            while self._flush_batch():
+                pass
+
+    def shutdown(self):
+        """Stop the background thread and drain the queue"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='chat-write-behind', daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                # Sleep until something is queued; only then start the flush interval
+                while not self._stopping and not self._pending:
+                    self._condition.wait()
+                if not self._stopping and len(self._pending) < self.batch_size:
+                    self._condition.wait(self.flush_interval)
+                if self._stopping:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing chat messages: {e}")
+                time.sleep(self.flush_interval)
+
+    def _flush_batch(self):
+        """Commit up to batch_size queued messages in one transaction.
+
+        Messages stay visible in the queue until the commit succeeds, so a
+        failed flush is retried and pending_for() never loses a message.
+        """
+        with self._condition:
+            batch = list(itertools.islice(self._pending, self.batch_size))
+        if not batch:
+            return False
+
+        rows = [{
+            'event_id': data['event_id'],
+            'user': data['user'],
+            'message': data['message'],
+            'timestamp': timestamp
+        } for _, timestamp, data in batch]
+
+        with self.app.app_context():
+            try:
+                result = db.session.execute(
+                    insert(ChatMessage).returning(ChatMessage.id, sort_by_parameter_order=True),
+                    rows
+                )
+                ids = result.scalars().all()
+                # Record the real IDs before they become visible to readers
+                self._remember_persisted(batch, ids)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                self._forget_persisted(batch)
+                raise
+
+        with self._condition:
+            for _ in batch:
+                self._pending.popleft()
+
+        if self.on_persisted is not None:
+            persisted = {}
+            for (event_url, _, data), message_id in zip(batch, ids):
+                persisted.setdefault(event_url, []).append({
+                    'provisional_id': data['id'],
+                    'id': message_id
+                })
+            for event_url, mapping in persisted.items():
+                self.on_persisted(event_url, mapping)
+        return True
+
+    def _remember_persisted(self, batch, ids):
+        with self._condition:
+            for (_, _, data), message_id in zip(batch, ids):
+                self._persisted[data['id']] = message_id
+            while len(self._persisted) > PERSISTED_ID_HISTORY:
+                self._persisted.popitem(last=False)
+
+    def _forget_persisted(self, batch):
+        # A rolled-back insert's IDs can be reused by other messages
+        with self._condition:
+            for _, _, data in batch:
+                self._persisted.pop(data['id'], None)
+
+
+chat_writer = ChatWriteBehind()
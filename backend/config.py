@@ -0,0 +1,20 @@
+import os
+import secrets
+
+
+class Config:
+    """Default application configuration, overridable through environment variables"""
+    # Set SECRET_KEY in the environment so every worker process shares the same key
+    SECRET_KEY = os.getenv('SECRET_KEY') or secrets.token_hex(16)
+
+    # Database configuration
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///lemma_check_house.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Upper bound on serialized event payloads kept in memory per process
+    EVENT_CACHE_MAX_BYTES = int(os.getenv('EVENT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+    # Write-behind chat: broadcast immediately, commit in batches from a background thread
+    CHAT_WRITE_BEHIND = os.getenv('CHAT_WRITE_BEHIND', '0') == '1'
+    CHAT_FLUSH_INTERVAL_MS = int(os.getenv('CHAT_FLUSH_INTERVAL_MS', 5))
+    CHAT_FLUSH_BATCH_SIZE = int(os.getenv('CHAT_FLUSH_BATCH_SIZE', 100))
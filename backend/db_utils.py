@@ -1,10 +1,56 @@
+from flask import Flask
+from sqlalchemy import inspect, text
 from models import db, User
+from config import Config
 from werkzeug.security import generate_password_hash
 import os
 
+
+def create_db_app(config=None):
+    """Create a bare Flask app with only the database bound.
+
+    Used by CLI scripts and worker processes that need an app context but
+    not the web stack (routes, Socket.IO, CORS).
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if isinstance(config, dict):
+        app.config.from_mapping(config)
+    elif config is not None:
+        app.config.from_object(config)
+    db.init_app(app)
+    return app
+
+def upgrade_schema():
+    """Add columns introduced after a table was first created.
+
+    db.create_all() only creates missing tables, so existing databases need
+    new nullable/defaulted columns added in place.
+    """
+    inspector = inspect(db.engine)
+    existing_tables = inspector.get_table_names()
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+                if column.server_default is not None:
+                    ddl += f" DEFAULT '{column.server_default.arg}'"
+                    if not column.nullable:
+                        ddl += ' NOT NULL'
+                connection.execute(text(ddl))
+                print(f"Added column {table.name}.{column.name}")
+
+
 def init_db():
     """Initialize the database and create admin user if doesn't exist"""
     db.create_all()
+    upgrade_schema()
     
     # Check if admin user exists
     admin_user = User.query.filter_by(username='admin').first()
@@ -23,6 +69,6 @@ def init_db():
         print("Admin user already exists")
 
 if __name__ == '__main__':
-    from app import app
+    app = create_db_app()
     with app.app_context():
         init_db()
\ No newline at end of file
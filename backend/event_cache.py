@@ -0,0 +1,69 @@
+from collections import OrderedDict
+import threading
+
+
+class EventPayloadCache:
+    """Bounded in-process LRU cache of serialized event payloads.
+
+    Entries are keyed by event URL and stamped with the event version they
+    were serialized from, so a stale entry is never served even if another
+    process wrote the event. Eviction is by total payload size in bytes.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_bytes = app.config.get('EVENT_CACHE_MAX_BYTES', self.max_bytes)
+        self.clear()
+
+    def get(self, url, version):
+        """Return the cached payload bytes for `url` at `version`, or None"""
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+            if entry[0] != version:
+                self._remove(url)
+                return None
+            self._entries.move_to_end(url)
+            return entry[1]
+
+    def put(self, url, version, payload):
+        """Store serialized payload bytes, evicting least recently used entries"""
+        with self._lock:
+            self._remove(url)
+            if len(payload) > self.max_bytes:
+                return
+            self._entries[url] = (version, payload)
+            self._size += len(payload)
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def invalidate(self, url):
+        with self._lock:
+            self._remove(url)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    @property
+    def size(self):
+        return self._size
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, url):
+        entry = self._entries.pop(url, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+
+event_cache = EventPayloadCache()
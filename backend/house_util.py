@@ -1,10 +1,11 @@
 import json
 from models import db, House
-from app import app
+from db_utils import create_db_app
 
 with open('prh-estates.json', 'r', encoding='utf-8') as file:
     prh_estates = json.load(file)
 
+app = create_db_app()
 with app.app_context():
     for estate in prh_estates:
         name = estate["Estate Name"]["zh-Hant"]
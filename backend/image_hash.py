@@ -0,0 +1,114 @@
+import hashlib
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from image_utils import decode_image_data, normalize_images
+
+# Hamming distance (out of 64 bits) at or below which two images count as near-duplicates
+DEFAULT_MAX_DISTANCE = 10
+HASH_KINDS = ('dhash', 'phash')
+
+
+def _bits_to_hex(bits):
+    return np.packbits(bits.flatten()).tobytes().hex()
+
+
+def dhash(image):
+    """64-bit difference hash: sign of horizontal gradients on a 9x8 thumbnail"""
+    pixels = np.asarray(image.convert('L').resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    return _bits_to_hex(pixels[:, 1:] > pixels[:, :-1])
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    matrix = np.cos(np.pi * k * (2 * np.arange(n)[None, :] + 1) / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT_32 = _dct_matrix(32)
+
+
+def phash(image):
+    """64-bit perceptual hash: low-frequency DCT coefficients of a 32x32 thumbnail vs. their median"""
+    pixels = np.asarray(image.convert('L').resize((32, 32), Image.LANCZOS), dtype=np.float64)
+    low = (_DCT_32 @ pixels @ _DCT_32.T)[:8, :8]
+    # The DC term only reflects overall brightness, so leave it out of the median
+    return _bits_to_hex(low > np.median(low.flatten()[1:]))
+
+
+def hash_image_bytes(image_bytes):
+    """Return {'sha256', 'dhash', 'phash'} for raw image bytes"""
+    with Image.open(BytesIO(image_bytes)) as image:
+        # Let JPEGs decode straight to a small grayscale image (no-op for other formats)
+        image.draft('L', (64, 64))
+        image.load()
+        return {
+            'sha256': hashlib.sha256(image_bytes).hexdigest(),
+            'dhash': dhash(image),
+            'phash': phash(image)
+        }
+
+
+def compute_image_hashes(images, known_hashes=None):
+    """Hash each stored image of a problem; unreadable images get None.
+
+    Images found in `known_hashes` (image string -> hashes) reuse that entry.
+    """
+    known_hashes = known_hashes or {}
+    hashes = []
+    for img_data in normalize_images(images):
+        if isinstance(img_data, str) and img_data in known_hashes:
+            hashes.append(known_hashes[img_data])
+            continue
+        try:
+            hashes.append(hash_image_bytes(decode_image_data(img_data)))
+        except Exception as e:
+            print(f"Error hashing image: {e}")
+            hashes.append(None)
+    return hashes
+
+
+def _popcount(values):
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8).reshape(*values.shape, 8), axis=-1).sum(axis=-1)
+
+
+def find_near_duplicates(hashes, max_distance=DEFAULT_MAX_DISTANCE, block_size=1024):
+    """Return (i, j, distance) for every pair i < j within `max_distance` bits.
+
+    `hashes` is a sequence of 16-digit hex strings. Distances are computed
+    with vectorized XOR/popcount a block of rows at a time, so memory stays
+    at block_size * len(hashes) regardless of how many images there are.
+    """
+    values = np.array([int(h, 16) for h in hashes], dtype=np.uint64)
+    pairs = []
+    for start in range(0, len(values), block_size):
+        block = values[start:start + block_size]
+        distances = _popcount(block[:, None] ^ values[None, :])
+        rows, cols = np.nonzero(distances <= max_distance)
+        rows += start
+        keep = cols > rows
+        for i, j in zip(rows[keep], cols[keep]):
+            pairs.append((int(i), int(j), int(distances[i - start, j])))
+    return pairs
+
+
+if __name__ == '__main__':
+    # Backfill hashes for problems stored before hashing at ingest existed
+    from db_utils import create_db_app
+    from models import db, Problem
+
+    app = create_db_app()
+    with app.app_context():
+        updated = 0
+        for problem in Problem.query.all():
+            images = normalize_images(problem.image)
+            if problem.image_hashes is None or len(problem.image_hashes) != len(images):
+                problem.image_hashes = compute_image_hashes(images)
+                updated += 1
+        db.session.commit()
+        print(f"Hashed images of {updated} problem(s).")
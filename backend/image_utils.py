@@ -0,0 +1,35 @@
+import base64
+import json
+
+
+def decode_image_data(img_data):
+    """Decode a stored image (base64, optionally a data URL) to raw bytes"""
+    if isinstance(img_data, str):
+        # Remove data URL prefix if present (e.g., "data:image/jpeg;base64,")
+        if img_data.startswith('data:'):
+            comma_index = img_data.find(',')
+            if comma_index != -1:
+                img_data = img_data[comma_index + 1:]
+
+        # Clean up any whitespace or newlines
+        img_data = img_data.strip().replace('\n', '').replace('\r', '')
+    return base64.b64decode(img_data)
+
+
+def normalize_images(images):
+    """Return a problem's images as a list.
+
+    Accepts a list, a single image string or a JSON-encoded list, the same
+    shapes the report generator has always tolerated in Problem.image.
+    """
+    if not images:
+        return []
+    if isinstance(images, str):
+        try:
+            decoded = json.loads(images)
+        except ValueError:
+            return [images]
+        return decoded if isinstance(decoded, list) else [images]
+    if not isinstance(images, list):
+        return [images]
+    return images
@@ -21,6 +21,7 @@ class Problem(db.Model):
     id = Column(Integer, primary_key=True)
     event_id = Column(Integer, db.ForeignKey('events.id'), nullable=False)
     image = Column(JSON, nullable=True)  # List of byte string images
+    image_hashes = Column(JSON, nullable=True)  # Per-image {'sha256', 'dhash', 'phash'}, parallel to image
     description = Column(Text, nullable=True)
     important = Column(Boolean, default=False)
     category = Column(String(100), default='general')
@@ -64,6 +65,11 @@ class Event(db.Model):
     old_house_id = Column(String(100), nullable=True)
     flat = Column(String(100), nullable=True)
     customer_name = Column(String(200), nullable=True)
+    # Bumped on every event or problem write; used for ETags and cache invalidation
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+    # Sequence number of the event's latest EventChange
+    last_change_seq = Column(Integer, nullable=False, default=0, server_default='0')
+    updated_at = Column(DateTime, default=datetime.utcnow)
     problems = db.relationship('Problem', back_populates='event', cascade='all, delete-orphan')
     house = db.relationship('House', back_populates='events')
 
@@ -75,13 +81,60 @@ class Event(db.Model):
             'old_house_id': self.old_house_id,
             'flat': self.flat,
             'customer_name': self.customer_name,
+            'version': self.version,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'house': self.house.to_dict() if self.house else None,
             'problems': [problem.to_dict() for problem in self.problems]
         }
+
+    def touch(self):
+        """Mark the event as changed; call on every event or problem write"""
+        # Increment in SQL so concurrent writers never reuse a version
+        self.version = Event.version + 1
+        self.updated_at = datetime.utcnow()
+
+    @property
+    def etag(self):
+        return f'{self.id}-{self.version}'
     
     def __repr__(self):
         return f'<Event {self.id}>'
 
+class EventChange(db.Model):
+    """Append-only log of writes to an event, used for delta sync.
+
+    `seq` is allocated per event from Event.last_change_seq while the event
+    row is being updated, so it is contiguous and follows commit order on
+    any database backend.
+    """
+    __tablename__ = 'event_changes'
+    __table_args__ = (db.UniqueConstraint('event_id', 'seq'),)
+
+    PROBLEM_ADDED = 'problem_added'
+    PROBLEM_UPDATED = 'problem_updated'
+    PROBLEM_REMOVED = 'problem_removed'
+    EVENT_UPDATED = 'event_updated'
+
+    id = Column(Integer, primary_key=True)
+    event_id = Column(Integer, db.ForeignKey('events.id'), nullable=False)
+    seq = Column(Integer, nullable=False)
+    kind = Column(String(32), nullable=False)
+    problem_id = Column(Integer, nullable=True)
+    data = Column(JSON, nullable=True)  # Changed event fields for event_updated
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def to_dict(self, problem=None):
+        """Serialize the change; `problem` is the current Problem for added/updated changes"""
+        return {
+            'seq': self.seq,
+            'event_id': self.event_id,
+            'kind': self.kind,
+            'problem_id': self.problem_id,
+            'problem': problem.to_dict() if problem else None,
+            'data': self.data,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
 class ChatMessage(db.Model):
     __tablename__ = 'chat_messages'
     id = Column(Integer, primary_key=True)
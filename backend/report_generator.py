@@ -3,16 +3,23 @@ from docx.shared import Inches, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.style import WD_STYLE_TYPE
 from datetime import datetime
-import base64
-import json
+import hashlib
 import os
 from io import BytesIO
 from models import Event
 from docx.oxml.ns import qn
+from docx.oxml.shape import CT_Inline
+from image_utils import decode_image_data, normalize_images
+
+# Set image width to half of paper width (assuming standard A4: 8.27 inches width)
+# Paper width minus margins is approximately 6.5 inches, so half would be 3.25 inches
+PICTURE_WIDTH = Inches(3.25)
 
 class ReportGenerator:
     def __init__(self):
         self.document = Document()
+        # sha256 of image bytes -> (rId, filename, cx, cy) of its embedded picture part
+        self._pictures = {}
         
     def create_event_report(self, event):
         """Generate a Word document report for the given event"""
@@ -141,50 +148,32 @@ class ReportGenerator:
             run._element.rPr.rFonts.set(qn('w:eastAsia'), zh_font_name)
         # Images (if any)
         if hasattr(problem, 'image') and problem.image:
-            images = problem.image
-            if isinstance(images, str):
-                try:
-                    images = json.loads(images)
-                except:
-                    images = [images]
-            elif not isinstance(images, list):
-                images = [images]
+            images = normalize_images(problem.image)
             if images:
+                stored_hashes = getattr(problem, 'image_hashes', None) or []
                 for img_idx, img_data in enumerate(images):
                     try:
-                        # Handle base64 image data more robustly
-                        if isinstance(img_data, str):
-                            # Remove data URL prefix if present (e.g., "data:image/jpeg;base64,")
-                            if img_data.startswith('data:'):
-                                # Find the comma that separates the header from the base64 data
-                                comma_index = img_data.find(',')
-                                if comma_index != -1:
-                                    img_data = img_data[comma_index + 1:]
-
-                            # Clean up any whitespace or newlines
-                            img_data = img_data.strip().replace('\n', '').replace('\r', '')
-
-                            # Decode base64
-                            image_data = base64.b64decode(img_data)
-                        else:
-                            # If it's not a string, try to decode directly
-                            image_data = base64.b64decode(img_data)
+                        # Exact duplicates reuse the first copy's picture part without decoding again
+                        stored = stored_hashes[img_idx] if img_idx < len(stored_hashes) else None
+                        sha256 = stored.get('sha256') if stored else None
+                        if sha256 in self._pictures:
+                            self._insert_picture(*self._pictures[sha256])
+                            continue
+
+                        image_data = decode_image_data(img_data)
 
                         # Validate that we have actual image data
                         if len(image_data) < 100:  # Very small data likely indicates an error
                             raise ValueError("Image data too small")
 
-                        image_stream = BytesIO(image_data)
-                        # Reset stream position to beginning
-                        image_stream.seek(0)
-
-                        try:
-                            # Set image width to half of paper width (assuming standard A4: 8.27 inches width)
-                            # Paper width minus margins is approximately 6.5 inches, so half would be 3.25 inches
-                            self.document.add_picture(image_stream, width=Inches(3.25))
-                        except Exception as pic_error:
-                            print(f"Picture error: {str(pic_error)}")
-                            raise pic_error
+                        sha256 = sha256 or hashlib.sha256(image_data).hexdigest()
+                        if sha256 not in self._pictures:
+                            try:
+                                self._pictures[sha256] = self._add_picture_part(image_data)
+                            except Exception as pic_error:
+                                print(f"Picture error: {str(pic_error)}")
+                                raise pic_error
+                        self._insert_picture(*self._pictures[sha256])
                         # Add caption (optional, can be removed if not needed)
                         # caption = self.document.add_paragraph()
                         # caption.alignment = WD_ALIGN_PARAGRAPH.CENTER
@@ -197,6 +186,19 @@ class ReportGenerator:
                             run.font.name = zh_font_name
                             run._element.rPr.rFonts.set(qn('w:eastAsia'), zh_font_name)
         self.document.add_paragraph()
+
+    def _add_picture_part(self, image_data):
+        """Add the image to the package and return (rId, filename, cx, cy) for inserting it"""
+        image_stream = BytesIO(image_data)
+        rId, image = self.document.part.get_or_add_image(image_stream)
+        cx, cy = image.scaled_dimensions(PICTURE_WIDTH, None)
+        return rId, image.filename, cx, cy
+
+    def _insert_picture(self, rId, filename, cx, cy):
+        """Insert an already-embedded picture in its own paragraph, like Document.add_picture"""
+        part = self.document.part
+        inline = CT_Inline.new_pic_inline(part.next_id, rId, filename, cx, cy)
+        self.document.add_paragraph().add_run()._r.add_drawing(inline)
     
 
     def save_document(self, filename):
@@ -223,9 +225,9 @@ def generate_event_report(event_url):
 
 if __name__ == "__main__":
     # Test the report generator
-    from app import app
-    from models import db
-    
+    from db_utils import create_db_app
+
+    app = create_db_app()
     with app.app_context():
         event = Event.query.first()
         if event:
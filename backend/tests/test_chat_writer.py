@@ -0,0 +1,171 @@
+from types import SimpleNamespace
+import threading
+import time
+
+import pytest
+
+import app as app_module
+import chat_writer as chat_writer_module
+from chat_writer import ChatWriteBehind
+from db_utils import create_db_app
+from models import db, ChatMessage
+
+EVENT = SimpleNamespace(id=1, url='event-url')
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return predicate()
+
+
+@pytest.fixture
+def db_app(tmp_path):
+    app = create_db_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'chat.db'}"})
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def make_writer(db_app):
+    writers = []
+
+    def make(interval_ms=60000, batch_size=100):
+        db_app.config.update(CHAT_FLUSH_INTERVAL_MS=interval_ms, CHAT_FLUSH_BATCH_SIZE=batch_size)
+        writer = ChatWriteBehind()
+        writer.init_app(db_app)
+        writers.append(writer)
+        return writer
+
+    yield make
+    for writer in writers:
+        writer.shutdown()
+
+
+def stored_messages(app):
+    with app.app_context():
+        return [m.message for m in ChatMessage.query.order_by(ChatMessage.id)]
+
+
+def test_full_batch_flushes_without_waiting_for_interval(db_app, make_writer):
+    writer = make_writer(batch_size=3)
+    for n in range(3):
+        writer.submit(EVENT, 'user', f'm{n}')
+    assert wait_until(lambda: stored_messages(db_app) == ['m0', 'm1', 'm2'])
+    assert writer.pending_for(EVENT.id) == []
+
+
+def test_partial_batch_flushes_after_interval(db_app, make_writer):
+    writer = make_writer(interval_ms=20)
+    data = writer.submit(EVENT, 'user', 'hello')
+    assert data['pending'] is True
+    assert data['id'].startswith('pending-')
+    assert wait_until(lambda: stored_messages(db_app) == ['hello'])
+
+
+def test_shutdown_drains_queue(db_app, make_writer):
+    writer = make_writer()
+    for n in range(5):
+        writer.submit(EVENT, 'user', f'm{n}')
+    assert stored_messages(db_app) == []
+    writer.shutdown()
+    assert stored_messages(db_app) == [f'm{n}' for n in range(5)]
+    with pytest.raises(RuntimeError):
+        writer.submit(EVENT, 'user', 'too late')
+
+
+def test_failed_commit_keeps_messages_queued(db_app, make_writer, monkeypatch):
+    writer = make_writer()
+    data = writer.submit(EVENT, 'user', 'keep me')
+
+    def failing_insert(*args, **kwargs):
+        raise RuntimeError('database is locked')
+
+    monkeypatch.setattr(chat_writer_module, 'insert', failing_insert)
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    assert [m['id'] for m in writer.pending_for(EVENT.id)] == [data['id']]
+    assert stored_messages(db_app) == []
+
+    monkeypatch.undo()
+    writer.flush()
+    assert writer.pending_for(EVENT.id) == []
+    assert stored_messages(db_app) == ['keep me']
+
+
+def test_on_persisted_reports_real_ids(db_app, make_writer):
+    writer = make_writer()
+    reported = []
+    writer.on_persisted = lambda event_url, mapping: reported.append((event_url, mapping))
+    data = writer.submit(EVENT, 'user', 'hello')
+    writer.flush()
+    with db_app.app_context():
+        message_id = ChatMessage.query.one().id
+    assert reported == [('event-url', [{'provisional_id': data['id'], 'id': message_id}])]
+
+
+def test_unpersisted_drops_messages_committed_before_db_read(db_app, make_writer):
+    writer = make_writer()
+    writer.submit(EVENT, 'user', 'hello')
+    pending = writer.pending_for(EVENT.id)
+
+    # Committed after the snapshot but before the read: listed once, from the DB
+    writer.flush()
+    with db_app.app_context():
+        committed_ids = {m.id for m in ChatMessage.query}
+    assert writer.unpersisted(pending, committed_ids) == []
+    # Committed after the read: the DB result misses it, so the snapshot keeps it
+    assert writer.unpersisted(pending, set()) == pending
+
+
+def test_get_chat_messages_never_duplicates_or_drops_during_flush(tmp_path, monkeypatch):
+    app = app_module.create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.db'}",
+        'CHAT_WRITE_BEHIND': True,
+    })
+    with app.app_context():
+        db.create_all()
+    writer = ChatWriteBehind()
+    app.config.update(CHAT_FLUSH_INTERVAL_MS=1, CHAT_FLUSH_BATCH_SIZE=4)
+    writer.init_app(app)
+    monkeypatch.setattr(app_module, 'chat_writer', writer)
+
+    url = app.test_client().get('/api/events').json['url']
+    accepted = []
+    posting_done = threading.Event()
+
+    def post_messages():
+        client = app.test_client()
+        for n in range(150):
+            response = client.post(f'/api/events/url/{url}/chat/messages', json={'message': f'm{n}'})
+            assert response.status_code == 202
+            accepted.append(f'm{n}')
+        posting_done.set()
+
+    poster = threading.Thread(target=post_messages)
+    poster.start()
+    reader = app.test_client()
+    reads = 0
+    try:
+        while not posting_done.is_set() or reads < 5:
+            before = set(accepted)
+            listed = [m['message'] for m in reader.get(f'/api/events/url/{url}/chat/messages').json['messages']]
+            assert len(listed) == len(set(listed))
+            assert before <= set(listed)
+            reads += 1
+    finally:
+        poster.join()
+        writer.shutdown()
+
+    listed = reader.get(f'/api/events/url/{url}/chat/messages').json['messages']
+    assert sorted(m['message'] for m in listed) == sorted(accepted)
+    assert all(isinstance(m['id'], int) for m in listed)
+    with app.app_context():
+        db.engine.dispose()
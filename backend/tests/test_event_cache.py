@@ -0,0 +1,62 @@
+from event_cache import EventPayloadCache
+
+
+def test_get_returns_payload_for_matching_version():
+    cache = EventPayloadCache(max_bytes=100)
+    cache.put('a', 1, b'payload')
+    assert cache.get('a', 1) == b'payload'
+    assert cache.get('missing', 1) is None
+
+
+def test_version_mismatch_drops_entry():
+    cache = EventPayloadCache(max_bytes=100)
+    cache.put('a', 1, b'x' * 10)
+    assert cache.get('a', 2) is None
+    assert len(cache) == 0
+    assert cache.size == 0
+    # The stale entry is gone, not just hidden
+    assert cache.get('a', 1) is None
+
+
+def test_evicts_least_recently_used_by_bytes():
+    cache = EventPayloadCache(max_bytes=30)
+    cache.put('a', 1, b'a' * 10)
+    cache.put('b', 1, b'b' * 10)
+    cache.put('c', 1, b'c' * 10)
+    # Touch 'a' so 'b' becomes the least recently used entry
+    assert cache.get('a', 1) is not None
+    cache.put('d', 1, b'd' * 15)
+    assert cache.get('b', 1) is None
+    assert cache.get('c', 1) is None
+    assert cache.get('a', 1) == b'a' * 10
+    assert cache.get('d', 1) == b'd' * 15
+    assert cache.size == 25
+
+
+def test_refuses_payload_larger_than_max_bytes():
+    cache = EventPayloadCache(max_bytes=10)
+    cache.put('a', 1, b'a' * 5)
+    cache.put('big', 1, b'x' * 11)
+    assert cache.get('big', 1) is None
+    assert cache.get('a', 1) == b'a' * 5
+    assert cache.size == 5
+
+
+def test_replacing_entry_updates_size():
+    cache = EventPayloadCache(max_bytes=100)
+    cache.put('a', 1, b'a' * 40)
+    cache.put('a', 2, b'a' * 10)
+    assert cache.size == 10
+    assert cache.get('a', 2) == b'a' * 10
+
+
+def test_invalidate_and_clear():
+    cache = EventPayloadCache(max_bytes=100)
+    cache.put('a', 1, b'a')
+    cache.put('b', 1, b'b')
+    cache.invalidate('a')
+    assert cache.get('a', 1) is None
+    assert cache.size == 1
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.size == 0
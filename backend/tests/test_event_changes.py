@@ -0,0 +1,120 @@
+from models import EventChange
+
+
+def get_changes(client, url, since=None):
+    query = '' if since is None else f'?since={since}'
+    response = client.get(f'/api/events/url/{url}/changes{query}')
+    assert response.status_code == 200
+    return response.json
+
+
+def add_problem(client, url, **fields):
+    response = client.post(f'/api/events/url/{url}/problems', json=fields)
+    assert response.status_code == 201
+    return response.json['problem_id']
+
+
+def stored_changes(app):
+    with app.app_context():
+        return [(c.seq, c.kind, c.problem_id, c.data)
+                for c in EventChange.query.order_by(EventChange.event_id, EventChange.seq)]
+
+
+def test_post_records_problem_added(app, client, event_url):
+    problem_id = add_problem(client, event_url, description='crack')
+    assert stored_changes(app) == [(1, EventChange.PROBLEM_ADDED, problem_id, None)]
+
+
+def test_put_problem_records_problem_updated(app, client, event_url):
+    problem_id = add_problem(client, event_url, description='crack')
+    response = client.put(f'/api/events/url/{event_url}/problems/{problem_id}',
+                          json={'description': 'big crack'})
+    assert response.status_code == 200
+    assert stored_changes(app)[-1] == (2, EventChange.PROBLEM_UPDATED, problem_id, None)
+
+
+def test_delete_problem_records_problem_removed(app, client, event_url):
+    problem_id = add_problem(client, event_url, description='crack')
+    response = client.delete(f'/api/events/url/{event_url}/problems/{problem_id}')
+    assert response.status_code == 200
+    assert stored_changes(app)[-1] == (2, EventChange.PROBLEM_REMOVED, problem_id, None)
+
+
+def test_put_event_records_field_and_problem_changes(app, client, event_url):
+    old_id = add_problem(client, event_url, description='old')
+    response = client.put(f'/api/events/url/{event_url}', json={
+        'flat': '12A',
+        'problems': [{'description': 'new'}]
+    })
+    assert response.status_code == 200
+    new_id = response.json['event']['problems'][0]['id']
+    assert stored_changes(app) == [
+        (1, EventChange.PROBLEM_ADDED, old_id, None),
+        (2, EventChange.EVENT_UPDATED, None, {'flat': '12A'}),
+        (3, EventChange.PROBLEM_REMOVED, old_id, None),
+        (4, EventChange.PROBLEM_ADDED, new_id, None),
+    ]
+
+
+def test_put_event_without_changes_records_nothing(app, client, event_url):
+    client.put(f'/api/events/url/{event_url}', json={'flat': '12A'})
+    client.put(f'/api/events/url/{event_url}', json={'flat': '12A'})
+    assert len(stored_changes(app)) == 1
+
+
+def test_seqs_are_per_event(app, client, event_url):
+    other_url = client.get('/api/events').json['url']
+    add_problem(client, event_url, description='a')
+    add_problem(client, other_url, description='b')
+    add_problem(client, event_url, description='c')
+    assert [c['seq'] for c in get_changes(client, event_url)['changes']] == [1, 2]
+    assert [c['seq'] for c in get_changes(client, other_url)['changes']] == [1]
+
+
+def test_only_latest_entry_carries_problem(client, event_url):
+    problem_id = add_problem(client, event_url, description='v0')
+    for n in range(1, 4):
+        client.put(f'/api/events/url/{event_url}/problems/{problem_id}', json={'description': f'v{n}'})
+
+    changes = get_changes(client, event_url)['changes']
+    assert [c['kind'] for c in changes] == [EventChange.PROBLEM_ADDED] + [EventChange.PROBLEM_UPDATED] * 3
+    assert [c['problem'] for c in changes[:-1]] == [None, None, None]
+    assert changes[-1]['problem']['description'] == 'v3'
+
+
+def test_removed_problem_has_no_state(client, event_url):
+    removed_id = add_problem(client, event_url, description='gone')
+    kept_id = add_problem(client, event_url, description='kept')
+    client.put(f'/api/events/url/{event_url}/problems/{removed_id}', json={'description': 'gone 2'})
+    client.delete(f'/api/events/url/{event_url}/problems/{removed_id}')
+
+    changes = get_changes(client, event_url)['changes']
+    for change in changes:
+        if change['problem_id'] == removed_id:
+            assert change['problem'] is None
+    kept = [c for c in changes if c['problem_id'] == kept_id]
+    assert kept[-1]['problem']['description'] == 'kept'
+
+
+def test_since_filters_and_latest_seq(client, event_url):
+    for n in range(3):
+        add_problem(client, event_url, description=f'p{n}')
+
+    result = get_changes(client, event_url, since=1)
+    assert [c['seq'] for c in result['changes']] == [2, 3]
+    assert result['latest_seq'] == 3
+    assert result['changes'][0]['problem']['description'] == 'p1'
+
+
+def test_latest_seq_falls_back_to_since(client, event_url):
+    add_problem(client, event_url, description='p')
+    result = get_changes(client, event_url, since=5)
+    assert result['changes'] == []
+    assert result['latest_seq'] == 5
+    assert get_changes(client, event_url)['latest_seq'] == 1
+
+
+def test_event_payload_reports_change_seq(client, event_url):
+    assert client.get(f'/api/events/url/{event_url}').json['event']['change_seq'] == 0
+    add_problem(client, event_url, description='p')
+    assert client.get(f'/api/events/url/{event_url}').json['event']['change_seq'] == 1
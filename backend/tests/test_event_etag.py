@@ -0,0 +1,96 @@
+import pytest
+from sqlalchemy import update
+
+from event_cache import event_cache
+from models import db, Event
+
+
+def get_event(client, url, etag=None):
+    headers = {'If-None-Match': etag} if etag else {}
+    return client.get(f'/api/events/url/{url}', headers=headers)
+
+
+def test_matching_etag_gets_304(client, event_url):
+    first = get_event(client, event_url)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    second = get_event(client, event_url, etag)
+    assert second.status_code == 304
+    assert second.headers['ETag'] == etag
+    assert second.data == b''
+
+
+def add_problem_by_url(client, url, problem_id):
+    client.post(f'/api/events/url/{url}/problems', json={'description': 'new'})
+
+
+def add_problem_by_id(client, url, problem_id):
+    event_id = client.get(f'/api/events/url/{url}').json['event']['id']
+    client.post(f'/api/events/{event_id}/problems', json={'description': 'new'})
+
+
+def update_problem(client, url, problem_id):
+    client.put(f'/api/events/url/{url}/problems/{problem_id}', json={'description': 'edited'})
+
+
+def delete_problem(client, url, problem_id):
+    client.delete(f'/api/events/url/{url}/problems/{problem_id}')
+
+
+def update_event_fields(client, url, problem_id):
+    client.put(f'/api/events/url/{url}', json={'flat': '7B'})
+
+
+def replace_problems(client, url, problem_id):
+    client.put(f'/api/events/url/{url}', json={'problems': [{'description': 'replacement'}]})
+
+
+@pytest.mark.parametrize('write', [
+    add_problem_by_url,
+    add_problem_by_id,
+    update_problem,
+    delete_problem,
+    update_event_fields,
+    replace_problems,
+])
+def test_every_write_bumps_version_and_etag(client, event_url, write):
+    problem_id = client.post(f'/api/events/url/{event_url}/problems',
+                             json={'description': 'original'}).json['problem_id']
+    before = get_event(client, event_url)
+    old_etag = before.headers['ETag']
+
+    write(client, event_url, problem_id)
+
+    after = get_event(client, event_url, old_etag)
+    assert after.status_code == 200
+    assert after.headers['ETag'] != old_etag
+    assert after.json['event']['version'] > before.json['event']['version']
+
+
+def test_write_outside_this_process_cache_is_not_masked(app, client, event_url):
+    first = get_event(client, event_url)
+    assert first.json['event']['flat'] is None
+    assert len(event_cache) == 1
+
+    # Simulate another worker process: it commits without touching our cache
+    with app.app_context():
+        db.session.execute(
+            update(Event)
+            .where(Event.url == event_url)
+            .values(flat='9C', version=Event.version + 1)
+        )
+        db.session.commit()
+
+    second = get_event(client, event_url, first.headers['ETag'])
+    assert second.status_code == 200
+    assert second.json['event']['flat'] == '9C'
+    assert second.headers['ETag'] != first.headers['ETag']
+
+
+def test_unchanged_event_is_served_from_cache(client, event_url):
+    first = get_event(client, event_url)
+    second = get_event(client, event_url)
+    assert second.status_code == 200
+    assert second.data == first.data
+    assert second.headers['ETag'] == first.headers['ETag']
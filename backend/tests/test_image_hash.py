@@ -0,0 +1,68 @@
+import json
+
+from image_hash import compute_image_hashes, find_near_duplicates
+from models import db, Problem
+
+
+def test_empty_input():
+    assert find_near_duplicates([]) == []
+
+
+def test_pairs_are_ordered_and_not_self_matched():
+    hashes = ['0000000000000000', '0000000000000001', 'ffffffffffffffff']
+    assert find_near_duplicates(hashes, max_distance=1) == [(0, 1, 1)]
+
+
+def test_exact_duplicates_have_zero_distance():
+    hashes = ['0123456789abcdef', 'fedcba9876543210', '0123456789abcdef']
+    assert find_near_duplicates(hashes, max_distance=0) == [(0, 2, 0)]
+
+
+def test_distance_threshold_is_inclusive():
+    hashes = ['0000000000000000', '000000000000000f']
+    assert find_near_duplicates(hashes, max_distance=4) == [(0, 1, 4)]
+    assert find_near_duplicates(hashes, max_distance=3) == []
+
+
+def test_pairs_found_across_block_boundary():
+    # Distinct hashes far apart from each other, plus near-copies placed so
+    # that each pair straddles a block boundary of size 3
+    hashes = [f'{(i * 0x0f0f0f0f0f0f0f0f) & 0xffffffffffffffff:016x}' for i in range(1, 8)]
+    hashes[4] = '00000000000000f0'
+    hashes[6] = '00000000000000f1'
+    hashes[1] = 'ffffffffffffffff'
+    hashes[5] = 'fffffffffffffffe'
+    pairs = find_near_duplicates(hashes, max_distance=1, block_size=3)
+    assert pairs == sorted(pairs)
+    assert (1, 5, 1) in pairs
+    assert (4, 6, 1) in pairs
+    assert all(i < j for i, j, _ in pairs)
+    # Same result as a single block
+    assert sorted(pairs) == sorted(find_near_duplicates(hashes, max_distance=1, block_size=100))
+
+
+def _png_base64(color):
+    import base64
+    from io import BytesIO
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new('RGB', (40, 40), color).save(buffer, 'PNG')
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def test_compute_image_hashes_accepts_single_and_json_encoded_images():
+    image = _png_base64('red')
+    assert len(compute_image_hashes(image)) == 1
+    assert len(compute_image_hashes(json.dumps([image, image]))) == 2
+    assert compute_image_hashes(None) == []
+    assert compute_image_hashes([image])[0]['sha256'] == compute_image_hashes(image)[0]['sha256']
+
+
+def test_single_string_image_is_hashed_once_at_ingest(app, client, event_url):
+    problem_id = client.post(f'/api/events/url/{event_url}/problems',
+                             json={'image': _png_base64('blue')}).json['problem_id']
+    with app.app_context():
+        hashes = db.session.get(Problem, problem_id).image_hashes
+    assert len(hashes) == 1
+    assert hashes[0] is not None
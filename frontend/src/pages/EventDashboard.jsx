@@ -21,6 +21,12 @@ export default function EventDashboard() {
   const [unreadCount, setUnreadCount] = useState(0);
   const [lastSeen, setLastSeen] = useState(Date.now());
   const socketRef = useRef(null);
+  // Sequence number of the last change-feed entry applied to `event`
+  const lastSeqRef = useRef(0);
+  // Pushes received while a catch-up request is in flight, applied after it
+  const catchingUpRef = useRef(false);
+  const bufferedPushesRef = useRef([]);
+  const showChatRef = useRef(showChat);
 
   useEffect(() => {
     fetchEvent();
@@ -30,6 +36,7 @@ export default function EventDashboard() {
     try {
       const response = await eventAPI.getEvent(eventId);
       if (response.data.success) {
+        lastSeqRef.current = response.data.event.change_seq || 0;
         setEvent(response.data.event);
         console.log('Fetched event:', response.data.event);
       }
@@ -125,9 +132,82 @@ export default function EventDashboard() {
     document.body.removeChild(link);
   };
 
-  // Setup Socket.IO for chat alerts
+  // Apply change-feed entries (pushed or fetched) as patches to the loaded event
+  const applyChanges = (changes) => {
+    const fresh = changes.filter(change => change.seq > lastSeqRef.current);
+    if (fresh.length === 0) return;
+    lastSeqRef.current = fresh[fresh.length - 1].seq;
+    setEvent(prev => {
+      if (!prev) return prev;
+      let next = { ...prev, problems: [...prev.problems] };
+      for (const change of fresh) {
+        if (change.kind === 'event_updated') {
+          next = { ...next, ...change.data };
+        } else if (change.kind === 'problem_removed') {
+          next.problems = next.problems.filter(p => p.id !== change.problem_id);
+        } else if (change.problem) {
+          // Catch-up responses only attach the latest state of each problem
+          const index = next.problems.findIndex(p => p.id === change.problem_id);
+          if (index === -1) {
+            next.problems.push(change.problem);
+          } else {
+            next.problems[index] = change.problem;
+          }
+        }
+      }
+      return next;
+    });
+  };
+
+  const catchUpChanges = async (url) => {
+    if (catchingUpRef.current) return;
+    catchingUpRef.current = true;
+    let caughtUp = false;
+    try {
+      const response = await eventAPI.getEventChanges(url, lastSeqRef.current);
+      if (response.data.success) {
+        applyChanges(response.data.changes);
+        caughtUp = true;
+      }
+    } catch (err) {
+      console.error('Failed to fetch event changes:', err);
+    } finally {
+      catchingUpRef.current = false;
+      const buffered = bufferedPushesRef.current;
+      bufferedPushesRef.current = [];
+      for (const changes of buffered) {
+        if (caughtUp) {
+          handlePushedChanges(url, changes);
+        } else {
+          // Don't retry in a loop; the next reconnect catches up again
+          applyChanges(changes);
+        }
+      }
+    }
+  };
+
+  const handlePushedChanges = (url, changes) => {
+    if (catchingUpRef.current) {
+      bufferedPushesRef.current.push(changes);
+      return;
+    }
+    // Seqs are consecutive per event, so a gap means a change was missed
+    if (changes.length > 0 && changes[0].seq > lastSeqRef.current + 1) {
+      bufferedPushesRef.current.push(changes);
+      catchUpChanges(url);
+      return;
+    }
+    applyChanges(changes);
+  };
+
+  useEffect(() => {
+    showChatRef.current = showChat;
+  }, [showChat]);
+
+  // Setup Socket.IO for chat alerts and event changes
+  const eventUrl = event?.url;
   useEffect(() => {
-    if (!event || !event.url) return;
+    if (!eventUrl) return;
 
     // Create socket connection
     socketRef.current = io(socketConfig.url, socketConfig.options);
@@ -137,7 +217,9 @@ export default function EventDashboard() {
     socket.on('connect', () => {
       console.log('Connected to server for chat alerts');
       // Join the chat room to listen for new messages
-      socket.emit('join_chat', { event_url: event.url });
+      socket.emit('join_chat', { event_url: eventUrl });
+      // Pick up anything missed while disconnected
+      catchUpChanges(eventUrl);
     });
 
     socket.on('joined_chat', (data) => {
@@ -148,11 +230,14 @@ export default function EventDashboard() {
     socket.on('chat_message', (message) => {
       console.log('Received chat message for alert:', message);
       // Only increment unread count if chat is not open and message is for this event
-      if (!showChat && message.event_url === event.url) {
+      if (!showChatRef.current && message.event_url === eventUrl) {
         setUnreadCount(c => c + 1);
       }
-      if(message?.system){
-        fetchEvent();
+    });
+
+    socket.on('event_changes', (payload) => {
+      if (payload.event_url === eventUrl) {
+        handlePushedChanges(eventUrl, payload.changes);
       }
     });
 
@@ -163,11 +248,11 @@ export default function EventDashboard() {
     // Cleanup on unmount or event change
     return () => {
       if (socket) {
-        socket.emit('leave_chat', { event_url: event.url });
+        socket.emit('leave_chat', { event_url: eventUrl });
         socket.disconnect();
       }
     };
-  }, [event, showChat]);
+  }, [eventUrl]);
 
   // Reset unread count when chatroom is opened
   useEffect(() => {
@@ -398,8 +483,8 @@ export default function EventDashboard() {
           <AddProblem
             onClose={() => setShowAddProblem(false)}
             onProblemAdded={() => {
+              // The new problem arrives through the 'event_changes' push
               setShowAddProblem(false);
-              fetchEvent();
             }}
           />
         )}
@@ -23,6 +23,10 @@ export const eventAPI = {
   getEvent: (url) => api.get(`/events/url/${url}`),
   updateEvent: (url, data) => api.put(`/events/url/${url}`, data),
   addProblem: (url, problemData) => api.post(`/events/url/${url}/problems`, problemData),
+  updateProblem: (url, problemId, problemData) => api.put(`/events/url/${url}/problems/${problemId}`, problemData),
+  deleteProblem: (url, problemId) => api.delete(`/events/url/${url}/problems/${problemId}`),
+  // Change feed: entries after sequence number `since` (also pushed as 'event_changes' over Socket.IO)
+  getEventChanges: (url, since = 0) => api.get(`/events/url/${url}/changes`, { params: { since } }),
   generateReport: (url) => api.get(`/events/${url}/report`, {
     responseType: 'blob' // Important for file download
   }),